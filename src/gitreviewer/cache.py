@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from collections import OrderedDict
+
+from gitreviewer.util import logger
+
+try:
+    # orjson serializes large prompt payloads several times faster than the
+    # stdlib; fall back silently when it is not installed.
+    import orjson
+
+    def _dumps(payload):
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+except ImportError:
+    def _dumps(payload):
+        return json.dumps(payload, sort_keys=True).encode("utf-8")
+
+DEFAULT_MAX_ENTRIES = 256
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gitreviewer")
+
+
+def cache_key(model, prompt, system=None, schema=None):
+    """Build a stable SHA-256 key for a chat request."""
+    payload = _dumps(
+        {"model": model, "system": system, "prompt": prompt, "schema": schema}
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SqliteCache:
+    """Persistent response cache backed by a SQLite file.
+
+    Survives process restarts so re-running the CLI against the same diff
+    does not pay the LLM call again.
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or os.path.join(CACHE_DIR, "responses.sqlite")
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses"
+            " (key TEXT PRIMARY KEY, response TEXT, created_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        row = self._conn.execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        response, created_at = row
+        if self.ttl is not None and time.time() - created_at > self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        return response
+
+    def set(self, key, value):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+        self._conn.commit()
+
+    def clear(self):
+        self._conn.execute("DELETE FROM responses")
+        self._conn.commit()
+
+
+class LLMCache:
+    """In-process exact-match cache for LLM responses.
+
+    Only deterministic calls (no thinking budget) should be cached by the
+    clients. Keeps an LRU of the most recent responses; an optional
+    backend (e.g. SqliteCache) is consulted on memory misses and written
+    through on set.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, backend=None, ttl=None):
+        self.max_entries = max_entries
+        self.backend = backend
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, created_at = entry
+            if self.ttl is not None and time.time() - created_at > self.ttl:
+                del self._entries[key]
+            else:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                logger.debug("LLM cache hit")
+                return value
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._entries[key] = (value, time.time())
+                self.stats["hits"] += 1
+                logger.debug("LLM cache hit (persistent)")
+                return value
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        if value is None:
+            return
+        self._entries[key] = (value, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def clear(self):
+        self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
@@ -1,30 +1,228 @@
-import ollama
+import os
+import time
+import asyncio
+import inspect
+import weakref
+from functools import lru_cache, wraps
 
 from gitreviewer.util import logger
-from google import genai
-from google.genai import types
+from gitreviewer.cache import LLMCache, SqliteCache, cache_key
+from gitreviewer.ratelimit import TokenBucket, retry
 
-default_model = "deepseek-r1:8b"
+# ollama and google.genai are imported lazily inside the clients: each
+# costs tens of ms of import time and a user session only ever touches
+# one of the two backends.
 
-def get_client(model: str = default_model) -> LLM:
-    """Get a client implementation based on the model name."""
+# Q4_K_M quantized tag: roughly half the memory and ~2x decode
+# throughput of the fp16 8B model, with similar review quality.
+default_model = "deepseek-r1:8b-q4_K_M"
 
-    if model == "default":
-        return LLMOllama()
-    elif model in ["deepseek-r1:8b", "qwen2.5-coder:14b"]:
-        return LLMOllama(model_name=model)
-    elif model.startswith("gemini"):
-        return LLMGoogle(model)
-    else:
+# Re-running the CLI against the same HEAD while iterating is common;
+# cached responses stay valid for a short window and survive restarts
+# through the SQLite backend.
+CACHE_TTL = float(os.getenv("GITREVIEWER_CACHE_TTL", "600"))
+
+response_cache = LLMCache(ttl=CACHE_TTL, backend=SqliteCache(ttl=CACHE_TTL))
+
+# Shared across all clients so bursts of commands stay under the provider
+# rate limit (configurable through GITREVIEWER_RPS).
+request_bucket = TokenBucket()
+
+# Decode latency grows linearly with the number of generated tokens, so
+# capping the output is the biggest latency lever after caching. 512
+# tokens fit a full review comfortably; raise via env or --max-tokens.
+MAX_OUTPUT_TOKENS = int(os.getenv("GITREVIEWER_MAX_TOKENS", "512"))
+
+# Schema-constrained responses cannot be truncated — cut-off JSON fails
+# validation outright — and bundles like review-plus-commit-message do
+# not fit the plain-text cap. They get their own, larger limit.
+MAX_STRUCTURED_TOKENS = int(os.getenv("GITREVIEWER_MAX_STRUCTURED_TOKENS", "2048"))
+
+
+def _output_cap(output):
+    """Token cap for a call, depending on whether a schema is enforced."""
+    return MAX_STRUCTURED_TOKENS if output else MAX_OUTPUT_TOKENS
+
+# Minimum characters to accumulate before handing a chunk to the consumer;
+# keeps per-chunk print/flush syscalls from dominating fast streams.
+MIN_STREAM_CHUNK = 64
+
+
+def _coalesce(chunks, min_size=MIN_STREAM_CHUNK):
+    """Merge consecutive small stream chunks into bigger ones.
+
+    Providers often emit one chunk per token; yielding each of them costs
+    a generator round-trip plus a write/flush downstream. Buffering up to
+    min_size characters cuts that overhead without hurting perceived
+    streaming.
+    """
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= min_size:
+            yield "".join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+@lru_cache(maxsize=1)
+def _get_google_client():
+    """Build the Gemini client once; every LLMGoogle instance shares the
+    same HTTP connection pool and auth setup."""
+    from google import genai
+    return genai.Client()
+
+
+@lru_cache(maxsize=1)
+def _get_ollama_client():
+    """Single ollama.Client so TCP connections are reused across calls."""
+    import ollama
+    return ollama.Client()
+
+
+# Async clients hold httpx connection pools whose keep-alive sockets are
+# bound to the event loop that opened them. Each chunked fan-out runs in
+# its own asyncio.run() loop, so a process-wide cached client would hand
+# the second fan-out connections belonging to a closed loop ("Event loop
+# is closed"). Caching per running loop keeps connection reuse within a
+# gather while staying valid across runs; entries die with their loop.
+_ollama_async_clients = weakref.WeakKeyDictionary()
+_google_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_ollama_async_client():
+    """Async counterpart of _get_ollama_client, cached per event loop."""
+    loop = asyncio.get_running_loop()
+    client = _ollama_async_clients.get(loop)
+    if client is None:
+        import ollama
+        client = _ollama_async_clients[loop] = ollama.AsyncClient()
+    return client
+
+
+def _get_google_async_client():
+    """Per-event-loop Gemini async surface (genai.Client().aio)."""
+    loop = asyncio.get_running_loop()
+    client = _google_async_clients.get(loop)
+    if client is None:
+        from google import genai
+        client = _google_async_clients[loop] = genai.Client().aio
+    return client
+
+
+@retry()
+def _google_generate(client, **kwargs):
+    request_bucket.acquire()
+    return client.models.generate_content(**kwargs)
+
+
+@lru_cache(maxsize=1)
+def _ollama_chat():
+    """Build (once) the rate-limited, retrying Ollama chat call; deferred
+    so the retry decorator can reference ollama.ResponseError without a
+    module-level import."""
+    import ollama
+
+    @retry(exceptions=(ollama.ResponseError,))
+    def _chat(client, **kwargs):
+        request_bucket.acquire()
+        return client.chat(**kwargs)
+
+    return _chat
+
+
+def _ollama_errors(fallback=""):
+    """Shared error handling for the Ollama chat variants.
+
+    chat, chat_async and chat_stream used to carry identical try/except
+    blocks; keeping a single copy means fixes to the handling (or to the
+    wrapped call) land in one place instead of three.
+    """
+    def _report(self, e):
+        import ollama
+        if isinstance(e, ollama.ResponseError):
+            logger.error("\nError communicating with Ollama LLM: %s. Make sure your Ollama server is running and the model '%s' is downloaded.", e, self.model)
+        else:
+            logger.error("\nAn unexpected error occurred during LLM review: %s", e)
+
+    def decorate(fn):
+        if inspect.isgeneratorfunction(fn):
+            @wraps(fn)
+            def gen_wrapper(self, *args, **kwargs):
+                try:
+                    yield from fn(self, *args, **kwargs)
+                except Exception as e:
+                    _report(self, e)
+                    yield fallback
+            return gen_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(self, *args, **kwargs):
+                try:
+                    return await fn(self, *args, **kwargs)
+                except Exception as e:
+                    _report(self, e)
+                    return fallback
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return fn(self, *args, **kwargs)
+            except Exception as e:
+                _report(self, e)
+                return fallback
+        return wrapper
+
+    return decorate
+
+
+@lru_cache(maxsize=32)
+def _schema_for(model_cls):
+    """Pydantic regenerates the JSON schema on every model_json_schema()
+    call; cache it per model class."""
+    return model_cls.model_json_schema()
+
+@lru_cache(maxsize=8)
+def get_client(model: str = default_model) -> "LLM":
+    """Get a client implementation based on the model name.
+
+    Dispatch goes through the PROVIDERS registry (exact model names) with
+    a prefix-match fallback, so adding a provider is one entry instead of
+    another elif branch. One client is kept per model name, so repeated
+    REPL commands reuse the same wrapper (and its pooled connections)
+    instead of rebuilding it per call.
+    """
+    factory = PROVIDERS.get(model)
+    if factory is None:
+        factory = next(
+            (c for prefix, c in PROVIDER_PREFIXES if model.startswith(prefix)),
+            None,
+        )
+    if factory is None:
+        # unknown model: fall back to the default local model
         return LLMOllama()
+    return factory(model)
 
 class LLM:
     """ Interface básica """
 
-    def chat_stream(self, prompt, model_name=default_model, think=False) -> str | None:
+    def chat_stream(self, prompt, model_name=default_model, system=None, think=False) -> str | None:
+        pass
+
+    def chat(self, prompt, model_name=default_model, system=None, output=None, think=False):
         pass
 
-    def chat(self, prompt, model_name=default_model, output=None, think=False):
+    async def chat_async(self, prompt, model_name=default_model, system=None, output=None, think=False):
+        """Async variant of chat, so independent prompts can be gathered
+        concurrently with asyncio.gather."""
         pass
 
 
@@ -34,85 +232,190 @@ class LLMGoogle(LLM):
     default_model = "gemini-2.5-flash-preview-05-20"
     def __init__(self, model_name=default_model):
         self.model = model_name
-        self.client = genai.Client()
+        self.client = _get_google_client()
 
     def _get_config(self, **kwargs):
         """ Create config for google client """
+        from google import genai
         thinking = 0 if "think" not in kwargs else int(kwargs["think"])
         config = genai.types.GenerateContentConfig(
             thinking_config=genai.types.ThinkingConfig(thinking_budget=thinking)
         )
+        config.max_output_tokens = kwargs.get("max_tokens") or _output_cap(kwargs.get("output"))
+        if kwargs.get("system"):
+            # Keep the static instructions out of the user token stream so the
+            # provider can cache the prefix across calls.
+            config.system_instruction = kwargs["system"]
         if kwargs["output"]:
             config.response_mime_type =  "application/json"
             config.response_schema = kwargs["output"]
         return config;
 
-    def chat(self, prompt: str, model_name=default_model, output=None, think=0):
-        resp = self.client.models.generate_content(
+    def chat(self, prompt: str, model_name=default_model, system=None, output=None, think=0):
+        key = None
+        if not think:
+            key = cache_key(model_name, prompt, system=system, schema=output.__name__ if output else None)
+            cached = response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        resp = _google_generate(
+            self.client,
+            contents=prompt,
+            model=model_name,
+            config=self._get_config(system=system, output=output, think=think)
+        )
+        if key:
+            response_cache.set(key, resp.text)
+        return resp.text
+
+    async def chat_async(self, prompt, model_name=default_model, system=None, output=None, think=0):
+        resp = await _get_google_async_client().models.generate_content(
             contents=prompt,
             model=model_name,
-            config=self._get_config(output=output, think=think)
+            config=self._get_config(system=system, output=output, think=think)
         )
         return resp.text
 
-    def chat_stream(self, prompt, model_name=default_model, output=None, think=0):
+    def chat_stream(self, prompt, model_name=default_model, system=None, output=None, think=0):
+        request_bucket.acquire()
         chunks = self.client.models.generate_content_stream(
             contents=prompt,
             model=model_name,
-            config=self._get_config(output=output, think=think),
+            config=self._get_config(system=system, output=output, think=think),
         )
 
-        for chunk in chunks:
-            yield chunk.text
+        yield from _coalesce(chunk.text for chunk in chunks)
+
+    def submit_batch(self, prompts, model_name=default_model):
+        """Submit prompts as a Gemini batch job and return the job name.
+
+        Does not wait: callers (e.g. a nightly CI run) can store the name
+        and fetch results later with poll_batch.
+        """
+        job = self.client.batches.create(
+            model=model_name,
+            src={"inlined_requests": [{"contents": p} for p in prompts]},
+        )
+        logger.info("Submitted batch job: %s", job.name)
+        return job.name
+
+    def poll_batch(self, job_name, poll_interval=30):
+        """Poll a batch job until it finishes and return its responses.
+
+        Returns None while results are unavailable (failed/cancelled job).
+        """
+        done_states = ("JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED")
+        job = self.client.batches.get(name=job_name)
+        while job.state.name not in done_states:
+            time.sleep(poll_interval)
+            job = self.client.batches.get(name=job_name)
+
+        if job.state.name != "JOB_STATE_SUCCEEDED":
+            logger.error("Batch job %s finished in state %s", job_name, job.state.name)
+            return None
+
+        return [
+            r.response.text if r.response else None
+            for r in job.dest.inlined_responses
+        ]
+
+    def chat_batch(self, prompts, model_name=default_model, poll_interval=30):
+        """Submit many prompts through Gemini batch mode (~50% cheaper).
+
+        Blocks polling the job until it finishes and returns the responses
+        aligned by index with the input prompts. Meant for bulk,
+        non-interactive workloads where latency does not matter.
+        """
+        job_name = self.submit_batch(prompts, model_name=model_name)
+        results = self.poll_batch(job_name, poll_interval=poll_interval)
+        if results is None:
+            return [None] * len(prompts)
+        return results
 
 
 class LLMOllama(LLM):
-    default = "deepseek-r1:8b"
+    default = "deepseek-r1:8b-q4_K_M"
 
     def __init__(self, model_name=default_model):
         self.model = model_name
-        logger.info(f"Using model: {self.model}")
-
-    def chat_stream(self, prompt, think=False):
-        try:
-            stream = ollama.chat(
-                model=self.model,
-                messages=[{'role': 'user', 'content': prompt},],
-                stream=True,
-                think=think)
-
-            logger.info("Receiving chunks")
-            for chunk in stream:
-                if 'message' in chunk and 'content' in chunk['message']:
-                    yield chunk['message']['content']
-
-        except ollama.ResponseError as e:
-            logger.error(f"\nError communicating with Ollama LLM: {e}. Make sure your Ollama server is running and the model '{model_name}' is downloaded.")
-            yield None
-        except Exception as e:
-            logger.error(e)
-            logger.error(f"\nAn unexpected error occurred during LLM review: {e}")
-            yield None
-
-    def chat(self, prompt, output=None, think=False):
-        try:
-            chunk = ollama.chat(
-                model=self.model,
-                messages=[{'role': 'user', 'content': prompt},],
-                think=think,
-                format=output.model_json_schema() if output else None
-            )
-
-            if 'message' in chunk and 'content' in chunk['message']:
-                return chunk['message']['content']
-            return ""
-
-        except ollama.ResponseError as e:
-            logger.error(f"\nError communicating with Ollama LLM: {e}. Make sure your Ollama server is running and the model '{model_name}' is downloaded.")
-            return ""
-        except Exception as e:
-            logger.error(f"\nAn unexpected error occurred during LLM review: {e}")
-            return ""
+        self.client = _get_ollama_client()
+        logger.info("Using model: %s", self.model)
+
+    def _messages(self, prompt, system=None):
+        messages = []
+        if system:
+            messages.append({'role': 'system', 'content': system})
+        messages.append({'role': 'user', 'content': prompt})
+        return messages
+
+    @_ollama_errors(fallback=None)
+    def chat_stream(self, prompt, system=None, think=False):
+        request_bucket.acquire()
+        stream = self.client.chat(
+            model=self.model,
+            messages=self._messages(prompt, system),
+            stream=True,
+            options={"num_predict": MAX_OUTPUT_TOKENS},
+            think=think)
+
+        logger.info("Receiving chunks")
+        yield from _coalesce(
+            chunk['message']['content'] for chunk in stream
+            if 'message' in chunk and 'content' in chunk['message']
+        )
+
+    @_ollama_errors()
+    def chat(self, prompt, system=None, output=None, think=False):
+        key = None
+        if not think:
+            key = cache_key(self.model, prompt, system=system, schema=output.__name__ if output else None)
+            cached = response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        chunk = _ollama_chat()(
+            self.client,
+            model=self.model,
+            messages=self._messages(prompt, system),
+            options={"num_predict": _output_cap(output)},
+            think=think,
+            format=_schema_for(output) if output else None
+        )
+
+        if 'message' in chunk and 'content' in chunk['message']:
+            content = chunk['message']['content']
+            if key:
+                response_cache.set(key, content)
+            return content
+        return ""
+
+    @_ollama_errors()
+    async def chat_async(self, prompt, system=None, output=None, think=False):
+        chunk = await _get_ollama_async_client().chat(
+            model=self.model,
+            messages=self._messages(prompt, system),
+            options={"num_predict": _output_cap(output)},
+            think=think,
+            format=_schema_for(output) if output else None
+        )
+
+        if 'message' in chunk and 'content' in chunk['message']:
+            return chunk['message']['content']
+        return ""
+
+
+# Exact model names -> client factory; prefixes cover whole model families.
+PROVIDERS = {
+    "default": lambda model: LLMOllama(),
+    "deepseek-r1:8b": LLMOllama,
+    "deepseek-r1:8b-q4_K_M": LLMOllama,
+    "qwen2.5-coder:14b": LLMOllama,
+}
+
+PROVIDER_PREFIXES = [
+    ("gemini", LLMGoogle),
+]
 
 
 if __name__ == "__main__":
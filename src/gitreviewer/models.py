@@ -4,3 +4,12 @@ from pydantic import BaseModel
 class CommitMessage(BaseModel):
     message: str
     details: list[str]
+
+
+class CommitMessageList(BaseModel):
+    messages: list[CommitMessage]
+
+
+class ReviewBundle(BaseModel):
+    commit: CommitMessage
+    review: str
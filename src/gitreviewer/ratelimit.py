@@ -0,0 +1,66 @@
+import os
+import time
+import random
+import threading
+from functools import wraps
+
+from gitreviewer.util import logger
+
+DEFAULT_RPS = float(os.getenv("GITREVIEWER_RPS", "5"))
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` requests per second, up to `burst`.
+
+    Smooths REPL bursts so provider rate limits (429s) are not tripped in
+    the first place. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate=DEFAULT_RPS, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        """Blocks until the requested tokens are available, then takes them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry(max_attempts=5, base_delay=1.0, max_delay=30.0, exceptions=(Exception,)):
+    """Retry decorator with exponential backoff and jitter.
+
+    Transient provider errors used to fall through to logger.error and an
+    empty response; retrying a few times recovers most of them.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            delay = base_delay
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return fn(*args, **kwargs)
+                except exceptions as e:
+                    if attempt == max_attempts:
+                        raise
+                    sleep_for = min(max_delay, delay) * random.uniform(0.5, 1.5)
+                    logger.warning(
+                        "LLM call failed (attempt %d/%d): %s; retrying in %.1fs",
+                        attempt, max_attempts, e, sleep_for,
+                    )
+                    time.sleep(sleep_for)
+                    delay *= 2
+        return wrapper
+    return decorator
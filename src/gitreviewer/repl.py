@@ -1,26 +1,74 @@
 import os
+import sys
 import pathlib
-from tqdm import tqdm
-from git import Repo, InvalidGitRepositoryError
 
-from gitreviewer.tools.code_review import CodeReviewer
-from gitreviewer.tools.git import GitDiffTool, GitMessageSuggestion
 from gitreviewer.util import logger, DEFAULT_MODEL
-
 from gitreviewer.llm import get_client
-from gitreviewer.parser import PythonParser
 
-def run_commit_command(repo_path, diff):
+# GitPython, tqdm, the tree-sitter parser and the review/commit tools
+# are imported inside the commands that use them: loading them up front
+# delays the first prompt even for a user who only runs /chat.
+
+# Diffs smaller than this are noise (stray whitespace, empty staging);
+# not worth an LLM round-trip.
+MIN_DIFF_BYTES = 20
+
+# Model used by /chat; overridden by init_repl when --model/--preset
+# picked one.
+_model = DEFAULT_MODEL
+
+
+def trivial_diff(diff):
+    """Returns True when the diff is empty or too small to review."""
+    return not diff or len(diff.strip()) < MIN_DIFF_BYTES
+
+
+# Flush streamed output to the terminal at most once per this many
+# characters; flushing on every chunk serializes the stream on kernel
+# writes.
+STREAM_FLUSH_BYTES = 4096
+
+
+def _stream_to_stdout(chunks):
+    """Writes stream chunks to stdout, flushing every few KB."""
+    out = sys.stdout
+    pending = 0
+    for chunk in chunks:
+        if chunk is None:
+            continue
+        out.write(chunk)
+        pending += len(chunk)
+        if pending >= STREAM_FLUSH_BYTES:
+            out.flush()
+            pending = 0
+    out.flush()
+
+
+def run_commit_command(repo_path, diff, commit_suggestion=None):
     """
     Executes the /commit command to generate a commit message suggestion
-    and optionally commits the changes.
+    and optionally commits the changes. A precomputed suggestion can be
+    passed in to skip the LLM call (used by /all).
     """
-    if not diff:
+    if trivial_diff(diff):
         print("No changes detected to suggest a commit message.")
         return
 
-    sug = GitMessageSuggestion()
-    commit_suggestion = sug.get_commit_message(diff)
+    from git import InvalidGitRepositoryError
+    from gitreviewer.tools.git import GitMessageSuggestion, get_repo
+
+    if commit_suggestion is None:
+        sug = GitMessageSuggestion()
+        # Echo the message text while it is generated, so the user is not
+        # staring at a frozen prompt during a long structured response.
+        print("\nSuggesting: ", end="", flush=True)
+
+        def _echo(ch):
+            sys.stdout.write(ch)
+            sys.stdout.flush()
+
+        commit_suggestion = sug.get_commit_message(diff, echo=_echo)
+        print()
 
     if commit_suggestion:
         print("\n--- Commit Message Suggestion ---")
@@ -32,7 +80,7 @@ def run_commit_command(repo_path, diff):
         print("---------------------------------\n")
 
         try:
-            repo = Repo(repo_path)
+            repo = get_repo(repo_path)
             # Get the current status of the repository
             status_output = repo.git.status('--short')
 
@@ -46,10 +94,10 @@ def run_commit_command(repo_path, diff):
                 return
 
         except InvalidGitRepositoryError:
-            logger.error(f"Error: '{repo_path}' is not a valid Git repository.")
+            logger.error("Error: '%s' is not a valid Git repository.", repo_path)
             return
         except Exception as e:
-            logger.error(f"An error occurred while getting repository status: {e}")
+            logger.error("An error occurred while getting repository status: %s", e)
             return
 
         # Ask the user if they want to commit
@@ -67,10 +115,10 @@ def run_commit_command(repo_path, diff):
                     print("\nChanges staged and committed successfully!")
                     break
                 except InvalidGitRepositoryError:
-                    logger.error(f"Error: '{repo_path}' is not a valid Git repository.")
+                    logger.error("Error: '%s' is not a valid Git repository.", repo_path)
                     break
                 except Exception as e:
-                    logger.error(f"An error occurred during commit: {e}")
+                    logger.error("An error occurred during commit: %s", e)
                     break
             elif user_confirm == 'n' or user_confirm == '':
                 print("Commit aborted. No changes were committed.")
@@ -84,61 +132,83 @@ def run_review_command(diff_content):
     """
     Executes the /review command to perform a code review and stream the response.
     """
-    if not diff_content:
+    if trivial_diff(diff_content):
         print("No changes detected to review.")
         return
 
+    from gitreviewer.tools.code_review import CodeReviewer
+
     reviewer = CodeReviewer()
     print("\n--- LLM Code Review Feedback (Streaming) ---")
-    for chunk in reviewer.review(diff_content):
-        if chunk is not None:
-            print(chunk, end='', flush=True)
+    _stream_to_stdout(reviewer.review(diff_content))
     print("\n--------------------------------------------\n")
 
+def run_all_command(repo_path, diff):
+    """
+    Executes the /all command: one LLM request returns both the code
+    review and the commit message suggestion for the current diff.
+    """
+    if trivial_diff(diff):
+        print("No changes detected to review.")
+        return
+
+    from gitreviewer.tools.code_review import CodeReviewer
+
+    reviewer = CodeReviewer()
+    bundle = reviewer.review_and_suggest(diff)
+    if bundle is None:
+        print("Could not generate the review.")
+        return
+
+    print("\n--- LLM Code Review Feedback ---")
+    print(bundle.review)
+    print("--------------------------------\n")
+    run_commit_command(repo_path, diff, commit_suggestion=bundle.commit)
+
+
 def run_index_command(repo_path):
     """
     Indexes all Python files in the repository and saves the parsed output to a file.
     """
-    logger.info(f"Indexing Python files in: {repo_path}")
+    from tqdm import tqdm
+    from gitreviewer.parser import parse_many
+    from gitreviewer.tools.git import ls_files
+
+    logger.info("Indexing Python files in: %s", repo_path)
     project_name = pathlib.Path(repo_path).name
     output_filename = f"{project_name}-index.txt"
     indexed_files_count = 0
 
-    ignored_directories = ['.venv', '.git', '__pycache__', '.pytest_cache', 'build', 'dist'] # Added common ignored directories
-
-
-    # Check if it's a Python project
-    is_python_project = False
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            if file.endswith(".py"):
-                is_python_project = True
-                break
-        if is_python_project:
-            break
+    # Let git apply the repository's .gitignore: generated files and
+    # vendored trees never reach the parser. The manual walk with a
+    # hardcoded ignore list only remains for non-repository paths.
+    py_files = ls_files(repo_path, suffix=".py")
+    if py_files is None:
+        ignored_directories = ['.venv', '.git', '__pycache__', '.pytest_cache', 'build', 'dist'] # Added common ignored directories
+        py_files = []
+        for root, dirs, files in os.walk(repo_path):
+            dirs[:] = [d for d in dirs if d not in ignored_directories]
+            for file in files:
+                if file.endswith(".py"):
+                    py_files.append(os.path.join(root, file))
 
-    if not is_python_project:
+    if not py_files:
         print(f"'{project_name}' does not appear to be a Python project (no .py files found). Indexing aborted.")
         return
 
-    with open(output_filename, "w", encoding="utf-8") as outfile:
-        for root, dirs, files in tqdm(os.walk(repo_path)):
-            dirs[:] = [d for d in dirs if d not in ignored_directories]
+    # Parsing dominates indexing time and releases the GIL, so the files
+    # are parsed in parallel and only the writes stay sequential.
+    parsed = parse_many(py_files)
 
-            for file in files:
-                if file.endswith(".py"):
-                    file_path = os.path.join(root, file)
-                    logger.debug(f"Parsing file: {file_path}")
-                    try:
-                        parser = PythonParser()
-                        parsed_content = parser.parse(file_path)
-                        if not parsed_content:
-                            continue
-                        outfile.write(parsed_content)
-                        outfile.write("\n" + "-"*80 + "\n") # Separator between files
-                        indexed_files_count += 1
-                    except Exception as e:
-                        logger.error(f"Error parsing {file_path}: {e}")
+    # 1 MiB buffer: the loop issues two small writes per file, which the
+    # default buffer size would push to the kernel far more often.
+    with open(output_filename, "w", encoding="utf-8", buffering=1 << 20) as outfile:
+        for file_path, parsed_content in tqdm(zip(py_files, parsed), total=len(py_files)):
+            if not parsed_content:
+                continue
+            outfile.write(parsed_content)
+            outfile.write("\n" + "-"*80 + "\n") # Separator between files
+            indexed_files_count += 1
 
     if indexed_files_count > 0:
         print(f"Successfully indexed {indexed_files_count} Python files. Output saved to '{output_filename}'")
@@ -153,22 +223,87 @@ def run_chat_command(message):
         print("No message provided for chat.")
         return
 
-    llm_client = get_client(DEFAULT_MODEL)  # Assuming get_client returns an instance of the LLM client
+    llm_client = get_client(_model)  # Assuming get_client returns an instance of the LLM client
     print("\n--- Chat with LLM (Streaming) ---")
-    for chunk in llm_client.chat_stream(message):
-        if chunk is not None:
-            print(chunk, end='', flush=True)
+    _stream_to_stdout(llm_client.chat_stream(message))
     print("\n---------------------------------\n")
 
 
+def _clean_repo(repo_path):
+    """Prints a notice and returns True when there is nothing to diff."""
+    from gitreviewer.tools.git import has_changes
+    if has_changes(repo_path):
+        return False
+    print("Working tree clean; nothing to review or commit.")
+    return True
+
+
+def _cmd_commit(repo_path, diff_tool, message):
+    if _clean_repo(repo_path):
+        return
+    logger.info("Getting git diff...")
+    diff = diff_tool.get_git_diff(repo_path)
+    logger.debug("\n--- Git Diff ---\n\n%s\n---------------", diff)
+    run_commit_command(repo_path, diff)
+
+
+def _cmd_review(repo_path, diff_tool, message):
+    if _clean_repo(repo_path):
+        return
+    logger.info("Getting git diff for code review...")
+    diff = diff_tool.get_git_diff(repo_path)
+    logger.debug("\n--- Git Diff for Review ---\n\n%s\n---------------", diff)
+    run_review_command(diff)
+
+
+def _cmd_all(repo_path, diff_tool, message):
+    if _clean_repo(repo_path):
+        return
+    logger.info("Getting git diff for review and commit suggestion...")
+    diff = diff_tool.get_git_diff(repo_path)
+    run_all_command(repo_path, diff)
+
+
+def _cmd_index(repo_path, diff_tool, message):
+    run_index_command(repo_path)
+
+
+def _cmd_chat(repo_path, diff_tool, message):
+    run_chat_command(message)
+
+
+# Command name -> handler; a dict lookup replaces the if/elif chain and
+# adding a command is one entry instead of another branch.
+_COMMANDS = {
+    "commit": _cmd_commit,
+    "review": _cmd_review,
+    "all": _cmd_all,
+    "index": _cmd_index,
+    "chat": _cmd_chat,
+}
+
+
 def init_repl(repo_path, model=None):
+    if model:
+        # The commands resolve their clients through these module
+        # constants at call time; override them all so --model/--preset
+        # steers every command instead of only the env fallback.
+        # Mirrors how main.py overrides llm.MAX_OUTPUT_TOKENS.
+        global _model
+        _model = model
+        from gitreviewer.tools import code_review, git
+        code_review.MODEL_REVIEWER = model
+        git.GIT_MODEL = model
+
     print(f"GitReviewer REPL. Reviewing repository: {repo_path}")
     print("Type /commit to get a commit message suggestion based on current diff.")
     print("Type /review to get a code review based on current diff.")
+    print("Type /all to get the review and the commit suggestion in a single LLM call.")
     print("Type /index to index all Python files in the repository.")
     print("Type /chat {message} - send the message to the LLM and stream the response")
     print("Type /exit to quit.")
 
+    from gitreviewer.tools.git import GitDiffTool
     diff_tool = GitDiffTool()
 
     while True:
@@ -183,23 +318,13 @@ def init_repl(repo_path, model=None):
             else:
                 message = ""
 
-            if command == "commit":
-                logger.info("Getting git diff...")
-                diff = diff_tool.get_git_diff(repo_path)
-                logger.debug(f"\n--- Git Diff ---\n\n{diff}\n---------------")
-                run_commit_command(repo_path, diff)
-            elif command == "review":
-                logger.info("Getting git diff for code review...")
-                diff = diff_tool.get_git_diff(repo_path)
-                logger.debug(f"\n--- Git Diff for Review ---\n\n{diff}\n---------------")
-                run_review_command(diff)
-            elif command == "index":
-                run_index_command(repo_path)
-            elif command == "chat":
-                run_chat_command(message)
-            elif command == "exit":
+            if command == "exit":
                 print("Exiting GitReviewer REPL.")
                 break
+
+            handler = _COMMANDS.get(command)
+            if handler:
+                handler(repo_path, diff_tool, message)
             else:
                 print(f"Unknown command: /{command}")
         else:
@@ -1,14 +0,0 @@
-class GitTool:
-    def __init__(self):
-        pass
-
-    def diff():
-        pass
-
-
-class FileTool:
-    def __init__(self):
-        pass
-
-    def list():
-        pass
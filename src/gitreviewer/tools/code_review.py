@@ -1,17 +1,68 @@
+import re
+import asyncio
+
+from pydantic import ValidationError
+
 from gitreviewer.llm import get_client
+from gitreviewer.models import ReviewBundle
 from gitreviewer.util import logger, DEFAULT_MODEL
 
-REVIEW_PROMPT = """
-You are a code reviewer. Please review the following git diff and provide feedback on potential issues,
+# Unified diffs start each file section with a 'diff --git' header.
+_DIFF_FILE_RE = re.compile(r"(?=^diff --git )", re.MULTILINE)
+
+# Diffs above this size are reviewed file-by-file and merged, instead of
+# paying one huge-context call.
+CHUNKED_REVIEW_THRESHOLD = 16_000
+MAX_PARALLEL_REVIEWS = 8
+
+
+def split_diff_by_file(diff):
+    """Splits a unified diff into one string per changed file."""
+    return [part for part in _DIFF_FILE_RE.split(diff) if part.strip()]
+
+REVIEW_SYSTEM_PROMPT = """
+You are a code reviewer. Please review the git diff sent by the user and provide feedback on potential issues,
 bugs, improvements, or anything noteworthy. Focus on code quality, security, and best practices.
 
-Diff:
-```diff
-{diff_content}
-```
+Provide your feedback in a concise and clear manner: at most 10 bullet
+points, no surrounding prose. Finish with recommendations.
+"""
+
+# The prompt scaffolding around the diff is pre-split into static
+# prefix/suffix parts and composed with join: str.format would re-parse
+# the template for placeholders on every call and choke on literal
+# braces in the diff if the pieces ever got inlined. Keeping the static
+# parts byte-identical across calls also lets providers cache the
+# prompt prefix.
+_REVIEW_PROMPT_PREFIX = "\nDiff:\n```diff\n"
+_REVIEW_PROMPT_SUFFIX = "\n```\n"
 
-Provide your feedback in a concise and clear manner.
-Finish with recommendations.
+
+def review_prompt(diff_content):
+    """Wraps a diff in the review prompt scaffolding."""
+    return ''.join((_REVIEW_PROMPT_PREFIX, diff_content, _REVIEW_PROMPT_SUFFIX))
+
+BUNDLE_SYSTEM_PROMPT = """
+You are a code reviewer. The user sends a git diff; do two things with it:
+
+1. Review the diff: point out potential issues, bugs, improvements, or anything
+   noteworthy, focusing on code quality, security, and best practices.
+   Be concise and finish with recommendations.
+2. Sugest a commit message for the diff. The first line should be the main
+   description of the changes; you can follow with a flat list of details,
+   3 at maximum.
+"""
+
+FILE_REVIEW_SYSTEM_PROMPT = """
+You are a code reviewer. The user sends the git diff of a single file.
+List the potential issues, bugs and improvements you find, focusing on code
+quality, security, and best practices. Be brief: a few bullet points at most.
+"""
+
+REDUCE_SYSTEM_PROMPT = """
+You are a code reviewer. The user sends per-file review notes for the files
+of one change. Merge them into a single concise review: drop duplicates,
+keep the important findings, and finish with recommendations.
 """
 
 MODEL_REVIEWER = DEFAULT_MODEL
@@ -19,11 +70,75 @@ MODEL_REVIEWER = DEFAULT_MODEL
 class CodeReviewer(object):
 
     def review(self, diff_content):
+        if diff_content is not None and not isinstance(diff_content, str):
+            # accept a stream of diff chunks (e.g. GitDiffTool.iter_git_diff)
+            diff_content = "".join(diff_content)
+
         if not diff_content:
             logger.info("No code changes to review.")
             yield None
             return
 
+        parts = split_diff_by_file(diff_content)
+        if len(parts) > 1 and len(diff_content) > CHUNKED_REVIEW_THRESHOLD:
+            yield from self._review_chunked(parts)
+            return
+
+        llm = get_client(MODEL_REVIEWER)
+        prompt = review_prompt(diff_content)
+        for token in llm.chat_stream(prompt, system=REVIEW_SYSTEM_PROMPT):
+            yield token
+
+    def _review_chunked(self, parts):
+        """Map-reduce review for large multi-file diffs.
+
+        Each file is reviewed by a concurrent short call, then one merge
+        call streams the consolidated feedback; k small passes plus a
+        small merge beat one huge-context request.
+        """
         llm = get_client(MODEL_REVIEWER)
-        for token in llm.chat_stream(REVIEW_PROMPT.format(diff_content=diff_content)):
+
+        async def _gather():
+            sem = asyncio.Semaphore(MAX_PARALLEL_REVIEWS)
+
+            async def _one(part):
+                async with sem:
+                    return await llm.chat_async(
+                        review_prompt(part),
+                        system=FILE_REVIEW_SYSTEM_PROMPT,
+                    )
+
+            return await asyncio.gather(*[_one(p) for p in parts])
+
+        sub_reviews = asyncio.run(_gather())
+        notes = "\n\n".join(
+            f"### File {i}\n{review}"
+            for i, review in enumerate(sub_reviews, start=1)
+            if review
+        )
+        for token in llm.chat_stream(notes, system=REDUCE_SYSTEM_PROMPT):
             yield token
+
+    def review_and_suggest(self, diff_content):
+        """Run the review and the commit-message suggestion in one request.
+
+        Both tasks share the same diff, so fusing them halves the network
+        round-trips and sends the diff tokens once.
+        """
+        if not diff_content:
+            logger.info("No code changes to review.")
+            return None
+
+        llm = get_client(MODEL_REVIEWER)
+        prompt = review_prompt(diff_content)
+        msg = llm.chat(prompt, system=BUNDLE_SYSTEM_PROMPT, output=ReviewBundle)
+        # chat returns "" (or None) when the provider call failed; let
+        # the REPL print its "could not generate" notice instead of
+        # dying on the ValidationError.
+        if not msg:
+            return None
+        try:
+            return ReviewBundle.model_validate_json(msg)
+        except ValidationError as e:
+            logger.error("Could not parse the review response: %s", e)
+            return None
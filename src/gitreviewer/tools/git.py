@@ -1,58 +1,347 @@
-from git import Repo, InvalidGitRepositoryError
+import os
+import asyncio
+import subprocess
+from functools import lru_cache
 
-from gitreviewer.models import CommitMessage
+from pydantic import ValidationError
+
+from gitreviewer.models import CommitMessage, CommitMessageList
 from gitreviewer.util import logger, DEFAULT_MODEL
 from gitreviewer.llm import get_client
+from gitreviewer.tools.code_review import (
+    split_diff_by_file,
+    CHUNKED_REVIEW_THRESHOLD,
+    MAX_PARALLEL_REVIEWS,
+)
 
 GIT_MODEL = DEFAULT_MODEL
 
 
-class GitMessageSuggestion:
-    def get_commit_message(self, diff):
-        msgprompt = f"""
-            You are a developer that write good commit messages:
+@lru_cache(maxsize=8)
+def get_repo(repo_path):
+    """Build a GitPython Repo once per path and reuse it.
 
+    Constructing a Repo re-reads .git/config and loads refs; callers that
+    need the object layer (status, commit) should go through this helper
+    instead of instantiating git.Repo on every command.
+    """
+    from git import Repo
+    return Repo(repo_path)
 
-            The first line should be the main description of the changes
-            You can follow with a flat list of details, 3 at maximum
 
-            Sugest a commit message for the following diff: \n\n
+def has_changes(repo_path):
+    """Cheap check for pending changes in the repository.
 
-            Diff:\n
-             {diff}
+    git status --porcelain is much cheaper than producing a diff, so
+    callers can skip the diff (and the LLM round-trip) entirely when the
+    working tree is clean.
+    """
+    result = subprocess.run(
+        ["git", "-C", repo_path, "status", "--porcelain"],
+        capture_output=True, text=True,
+    )
+    return bool(result.stdout.strip())
 
-            Respond only with the commit message, do not explain anything.
 
-            """
+def ls_files(repo_path, suffix=None):
+    """Lists tracked and untracked-but-not-ignored files via git.
+
+    git applies .gitignore (and the global excludes) in C, so indexing
+    commands skip generated and vendored files without re-implementing
+    ignore matching in Python — and without even opening the ignored
+    directories. Returns None when repo_path is not a git repository,
+    letting callers fall back to a plain directory walk.
+    """
+    result = subprocess.run(
+        ["git", "-C", repo_path, "ls-files", "-co", "--exclude-standard"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return None
+    return [
+        os.path.join(repo_path, line)
+        for line in result.stdout.splitlines()
+        if suffix is None or line.endswith(suffix)
+    ]
+
+
+COMMIT_SYSTEM_PROMPT = """
+    You are a developer that write good commit messages:
+
+
+    The first line should be the main description of the changes
+    You can follow with a flat list of details, 3 at maximum
+
+    Sugest a commit message for the diff sent by the user.
+
+    Respond only with the commit message, do not explain anything.
+
+    """
+
+
+# Static user-prompt prefix for the commit suggestion; the system prompt
+# already travels as a separate message, so keeping this prefix constant
+# leaves the diff as the only varying part of the payload.
+_DIFF_PREFIX = "Diff:\n"
+
+
+# chat_stream cannot enforce a schema mid-stream, so the shape is asked
+# for in the prompt and only validated once at stream end.
+_JSON_SHAPE_HINT = """
+    Respond with a single JSON object shaped as
+    {"message": "...", "details": ["...", "..."]} and nothing else.
+    """
+
+
+class _MessageEcho:
+    """Incrementally extracts the "message" value from streamed JSON.
+
+    Characters of the message are handed to the callback as soon as they
+    arrive, so the user watches the suggestion being written instead of
+    staring at a frozen prompt; the buffered JSON is still validated as
+    a whole once the stream ends.
+    """
+    _NEEDLE = '"message"'
+    # JSON escapes worth rendering; anything else echoes as itself.
+    _ESCAPES = {'n': '\n', 't': '\t', 'r': '\r'}
+
+    def __init__(self, echo):
+        self.echo = echo
+        self.buffer = ""
+        self._pos = 0
+        self._in_value = False
+        self._done = False
+        self._escape = False
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        if self._done or self.echo is None:
+            return
+        if not self._in_value:
+            start = self.buffer.find(self._NEEDLE)
+            if start < 0:
+                return
+            colon = self.buffer.find(':', start + len(self._NEEDLE))
+            if colon < 0:
+                return
+            quote = self.buffer.find('"', colon)
+            if quote < 0:
+                return
+            self._in_value = True
+            self._pos = quote + 1
+        while self._pos < len(self.buffer):
+            ch = self.buffer[self._pos]
+            self._pos += 1
+            if self._escape:
+                self._escape = False
+                self.echo(self._ESCAPES.get(ch, ch))
+            elif ch == '\\':
+                self._escape = True
+            elif ch == '"':
+                self._done = True
+                return
+            else:
+                self.echo(ch)
+
+
+def _validate_commit_message(msg):
+    """Parses the model's JSON into a CommitMessage, or returns None.
+
+    llm.chat comes back empty when the provider call failed and can
+    carry malformed JSON even with a schema; both used to raise
+    ValidationError straight out of the REPL loop.
+    """
+    if not msg:
+        return None
+    try:
+        return CommitMessage.model_validate_json(msg)
+    except ValidationError as e:
+        logger.error("Could not parse the commit suggestion: %s", e)
+        return None
+
+
+class GitMessageSuggestion:
+    def get_commit_message(self, diff, echo=None):
+        parts = split_diff_by_file(diff)
+        if len(parts) > 1 and len(diff) > CHUNKED_REVIEW_THRESHOLD:
+            return self._get_commit_message_chunked(parts)
+
+        if echo is not None:
+            return self._stream_commit_message(diff, echo)
+
+        msgprompt = _DIFF_PREFIX + diff
 
         """
         {"message": "Refactor GitReviewer for improved LLM integration and REPL functionality", "details": ["Introduced a `_get_config` method in `LLMGoogle` to centralize configuration handling for LLM calls.", "Refactored `main.py` to use a new `init_repl` function, streamlining the application's entry point and focusing on a REPL interface.", "Moved the `CommitMessage` Pydantic model to a dedicated `models.py` file for better organization and reusability."]}
         """
 
         llm = get_client(GIT_MODEL)
-        msg = llm.chat(msgprompt, output=CommitMessage)
-        return CommitMessage.model_validate_json(msg)
+        msg = llm.chat(msgprompt, system=COMMIT_SYSTEM_PROMPT, output=CommitMessage)
+        return _validate_commit_message(msg)
+
+    def _stream_commit_message(self, diff, echo):
+        """Streams the suggestion, echoing the message text as it arrives.
+
+        The model produces the same JSON shape, but the "message" value
+        is rendered through echo while it is being generated; schema
+        enforcement happens once, on the complete payload.
+        """
+        llm = get_client(GIT_MODEL)
+        extractor = _MessageEcho(echo)
+        for chunk in llm.chat_stream(_DIFF_PREFIX + diff, system=COMMIT_SYSTEM_PROMPT + _JSON_SHAPE_HINT):
+            if chunk:
+                extractor.feed(chunk)
+
+        # tolerate fenced or chatty output around the JSON object
+        raw = extractor.buffer
+        start = raw.find('{')
+        end = raw.rfind('}')
+        if start >= 0 and end > start:
+            raw = raw[start:end + 1]
+        try:
+            return CommitMessage.model_validate_json(raw)
+        except ValidationError:
+            # The stream died, got truncated, or the model ignored the
+            # shape hint: pay one schema-enforced call instead of
+            # crashing /commit.
+            logger.error("Streamed suggestion was not valid JSON; retrying with structured output")
+            msg = llm.chat(_DIFF_PREFIX + diff, system=COMMIT_SYSTEM_PROMPT, output=CommitMessage)
+            return _validate_commit_message(msg)
+
+    def _get_commit_message_chunked(self, parts):
+        """Map-reduce commit suggestion for large multi-file diffs.
+
+        Each file's changes are summarized by a concurrent plain-text
+        call (no schema overhead on the hot fan-out), then one small
+        structured call writes the message from the summaries;
+        overlapping the per-file round-trips replaces their sum with
+        their max.
+        """
+        llm = get_client(GIT_MODEL)
+
+        async def _gather():
+            sem = asyncio.Semaphore(MAX_PARALLEL_REVIEWS)
+
+            async def _one(part):
+                async with sem:
+                    return await llm.chat_async(
+                        f"Summarize the changes in this diff in at most 3 short lines.\n\nDiff:\n{part}"
+                    )
+
+            return await asyncio.gather(*[_one(p) for p in parts])
+
+        summaries = asyncio.run(_gather())
+        notes = "\n\n".join(
+            f"### File {i}\n{summary}"
+            for i, summary in enumerate(summaries, start=1)
+            if summary
+        )
+        msg = llm.chat(
+            f"Change summaries, one section per file:\n{notes}",
+            system=COMMIT_SYSTEM_PROMPT,
+            output=CommitMessage,
+        )
+        return _validate_commit_message(msg)
+
+    def get_commit_messages(self, diffs):
+        """Suggest commit messages for several diffs in one LLM request.
+
+        Marshals the diffs into numbered sections so the per-call overhead
+        (round-trip, rate limit slot) is paid once instead of len(diffs)
+        times. Returns the messages aligned by index with the input diffs.
+        """
+        sections = "\n\n".join(
+            f"### Diff {i}\n{diff}" for i, diff in enumerate(diffs, start=1)
+        )
+        msgprompt = f"""
+            Sugest one commit message for each of the {len(diffs)} numbered diffs below.
+            Return the messages in the same order as the diffs.
+
+            {sections}
+            """
+
+        llm = get_client(GIT_MODEL)
+        msg = llm.chat(msgprompt, system=COMMIT_SYSTEM_PROMPT, output=CommitMessageList)
+        if not msg:
+            return None
+        try:
+            return CommitMessageList.model_validate_json(msg).messages
+        except ValidationError as e:
+            logger.error("Could not parse the commit suggestions: %s", e)
+            return None
 
 
 class GitDiffTool:
 
-    def get_git_diff(self, repo_path):
+    def __init__(self):
+        # repo_path -> (.git/index mtime, diff); consecutive /commit and
+        # /review calls on an unchanged index reuse the same diff.
+        self._diff_cache = {}
+
+    def _index_mtime(self, repo_path):
+        try:
+            return os.path.getmtime(os.path.join(repo_path, ".git", "index"))
+        except OSError:
+            return None
+
+    def get_git_diff(self, repo_path, context_lines=3, path_filters=None):
         """
-        Gets the diff of the current changes in the specified Git repository.
-        This will get the diff between the working tree and the latest commit.
+        Gets the diff of the staged changes in the specified Git repository.
+        Shells out to `git diff` directly, avoiding the cost of building a
+        GitPython Repo object (config parsing, ref loading) on every call.
+
+        LLM cost scales with the diff size, so callers can shrink the
+        payload with a smaller context_lines or by restricting path_filters
+        to the paths they care about.
         """
+        key = (repo_path, context_lines, tuple(path_filters or ()))
+        mtime = self._index_mtime(repo_path)
+        if mtime is not None:
+            cached = self._diff_cache.get(key)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
         try:
-            repo = Repo(repo_path)
-            if repo.is_dirty(untracked_files=True):
-                # get staged and unstaged changes relative to HEAD
-                diff = repo.git.diff('HEAD', staged=True)
-                if not diff:
-                    logger.info("No changes detected in the working directory relative to HEAD.")
-                    return None
-                return diff
-            else:
+            cmd = [
+                "git", "-C", repo_path, "diff", "--cached",
+                "--no-color", f"-U{context_lines}",
+            ]
+            if path_filters:
+                cmd.append("--")
+                cmd.extend(path_filters)
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                logger.error("Error getting git diff for '%s': %s", repo_path, result.stderr.strip())
                 return None
-        except InvalidGitRepositoryError:
-            logger.error(f"Error: '{repo_path}' is not a valid Git repository.")
+            diff = result.stdout or None
+            if mtime is not None:
+                self._diff_cache[key] = (mtime, diff)
+            if not diff:
+                logger.info("No changes detected in the working directory relative to HEAD.")
+            return diff
         except Exception as e:
-            logger.error(f"An error occurred while getting git diff: {e}")
+            logger.error("An error occurred while getting git diff: %s", e)
+
+    def iter_git_diff(self, repo_path, context_lines=3, path_filters=None):
+        """
+        Streams the staged diff as chunks read from a git pipe.
+
+        Unlike get_git_diff this never holds the whole diff in one string,
+        so consumers that forward the diff piecewise (or bail out early)
+        keep memory at O(chunk) for very large changes.
+        """
+        cmd = [
+            "git", "-C", repo_path, "diff", "--cached",
+            "--no-color", f"-U{context_lines}",
+        ]
+        if path_filters:
+            cmd.append("--")
+            cmd.extend(path_filters)
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, bufsize=1 << 20, text=True
+        )
+        try:
+            yield from proc.stdout
+        finally:
+            proc.stdout.close()
+            proc.wait()
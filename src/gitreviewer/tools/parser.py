@@ -1,7 +1,12 @@
 import json
 import os
+import pickle
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 from gitreviewer.util import logger
+from gitreviewer.cache import CACHE_DIR
 from tree_sitter_language_pack import get_language, get_parser
 
 try:
@@ -11,78 +16,170 @@ except Exception as e:
     print(f"Error initializing Tree-sitter: {e}")
     exit(1)
 
-def get_node_text(node, source_code_bytes):
-    """Extracts the text content of a Tree-sitter node."""
-    return source_code_bytes[node.start_byte:node.end_byte].decode('utf8')
+# Bump to invalidate every cached entry, e.g. on a grammar upgrade or a
+# change to the entry layout below.
+PARSER_VERSION = 1
+
+# Compiled once per process: query construction builds a matching
+# automaton and used to run again for every parsed file.
+_TOP_LEVEL_QUERY = JAVA_LANGUAGE.query("""
+(
+    (package_declaration (scoped_identifier) @package_name)
+    (import_declaration (scoped_identifier) @import_name)?
+    (class_declaration)? @clazz
+    (record_declaration)? @rec
+    (interface_declaration)? @itf
+    (enum_declaration)? @enum
+)
+""")
+
+# Members of a type body, found by the query engine in C instead of a
+# Python loop testing the type of every body child. Run against a body
+# node; captures from nested type bodies are filtered out by the caller
+# with a parent check.
+_MEMBERS_QUERY = JAVA_LANGUAGE.query("""
+(method_declaration) @m
+(field_declaration) @f
+(constructor_declaration) @c
+""")
+
+AST_CACHE_DIR = os.path.join(CACHE_DIR, "java_ast")
+
+
+# In-memory front for the on-disk entry cache: repeated /index runs in
+# one session mostly hit unchanged files, which then cost a stat and a
+# dict lookup, not even a pickle load.
+_MEM_CACHE_ENTRIES = 4096
+_entry_cache = OrderedDict()
+
+
+def _remember(key, entry):
+    """Stores an entry in the in-memory LRU, evicting the oldest ones."""
+    if key is None:
+        return
+    _entry_cache[key] = entry
+    _entry_cache.move_to_end(key)
+    while len(_entry_cache) > _MEM_CACHE_ENTRIES:
+        _entry_cache.popitem(last=False)
+
+
+def _cache_path(file_path, st):
+    """Cache file path for one version of a Java source file."""
+    key = hashlib.blake2b(
+        f"{os.path.abspath(file_path)}:{st.st_mtime_ns}:{st.st_size}:{PARSER_VERSION}".encode()
+    ).hexdigest()
+    return os.path.join(AST_CACHE_DIR, f"{key}.pkl")
+
+def get_node_text(node, source_code):
+    """Extracts the text content of a Tree-sitter node.
+
+    source_code is either the raw bytes or the str produced by
+    _source_text. The str path is preferred: the file is then decoded
+    once and every node becomes a plain slice, instead of allocating a
+    small bytes object and re-running UTF-8 validation per node.
+    """
+    if isinstance(source_code, str):
+        return source_code[node.start_byte:node.end_byte]
+    return source_code[node.start_byte:node.end_byte].decode('utf8')
 
-def extract_modifiers(node, source_code_bytes):
-    """Extracts modifiers from a declaration node."""
-    modifiers = []
-    for child in node.children:
-        if child.type == 'modifiers':
-            for modifier_node in child.children:
-                modifiers.append(get_node_text(modifier_node, source_code_bytes))
-            break
-    return ' '.join(modifiers)
-
-def extract_type_parameters(node, source_code_bytes):
-    """Extracts type parameters (e.g., <T, U>)."""
-    type_params = []
-    for child in node.children:
-        if child.type == 'type_parameters':
-            for param_node in child.children:
-                if param_node.type == 'type_parameter':
-                    type_params.append(get_node_text(param_node, source_code_bytes))
-            break
-    return '<' + ', '.join(type_params) + '>' if type_params else ''
-
-def extract_extends_implements(node, source_code_bytes):
-    """Extracts extended classes and implemented interfaces."""
-    extends_clause = ""
-    implements_clause = ""
-    for child in node.children:
-        if child.type == 'superclass':
-            extends_clause = "extends " + get_node_text(child.children[1], source_code_bytes) # [1] is the type_identifier
-        elif child.type == 'super_interfaces':
-            interfaces = []
-            for interface_node in child.children:
-                if interface_node.type == 'type_list':
-                    for type_node in interface_node.children:
-                        if type_node.type == 'type_identifier': # Or other type nodes
-                            interfaces.append(get_node_text(type_node, source_code_bytes))
-            implements_clause = "implements " + ', '.join(interfaces)
-    return extends_clause, implements_clause
-
-def extract_method_parameters(node, source_code_bytes):
-    """Extracts parameters from a method declaration."""
-    params = []
-    for child in node.children:
-        if child.type == 'formal_parameters':
-            for param_child in child.children:
-                if param_child.type == 'formal_parameter':
-                    param_text = get_node_text(param_child, source_code_bytes)
-                    params.append(param_text)
-            break # Found formal_parameters, no need to search further
-    return ', '.join(params)
-
-def extract_throws_clause(node, source_code_bytes):
-    """Extracts the throws clause from a method declaration."""
-    throws_clause = ""
+
+def _source_text(source_bytes):
+    """Returns the source decoded once when byte offsets stay valid.
+
+    Tree-sitter reports byte offsets, which only equal character offsets
+    for ASCII input — the overwhelming majority of Java sources. Files
+    with non-ASCII bytes keep the per-node decode path.
+    """
+    if source_bytes.isascii():
+        return source_bytes.decode('ascii')
+    return source_bytes
+
+def extract_decl_parts(node, source_code):
+    """Collects every part of a declaration in one pass over its children.
+
+    Modifiers, type parameters, extends/implements clauses, formal
+    parameters and the throws clause used to be extracted by separate
+    helpers that each rescanned node.children, traversing a declaration
+    five times. One walk dispatching on the child type fills them all;
+    parts a declaration does not carry stay empty strings.
+    """
+    parts = {
+        'modifiers': '',
+        'type_parameters': '',
+        'extends': '',
+        'implements': '',
+        'parameters': '',
+        'throws': '',
+    }
     for child in node.children:
-        if child.type == 'throws':
-            exceptions = []
-            for exception_node in child.children:
-                if exception_node.type == 'type_identifier':
-                    exceptions.append(get_node_text(exception_node, source_code_bytes))
-            throws_clause = "throws " + ', '.join(exceptions)
-            break
-    return throws_clause
+        child_type = child.type
+        if child_type == 'modifiers':
+            parts['modifiers'] = ' '.join(
+                get_node_text(modifier_node, source_code)
+                for modifier_node in child.children
+            )
+        elif child_type == 'type_parameters':
+            type_params = [
+                get_node_text(param_node, source_code)
+                for param_node in child.children
+                if param_node.type == 'type_parameter'
+            ]
+            if type_params:
+                parts['type_parameters'] = '<' + ', '.join(type_params) + '>'
+        elif child_type == 'superclass':
+            parts['extends'] = "extends " + get_node_text(child.children[1], source_code) # [1] is the type_identifier
+        elif child_type == 'super_interfaces':
+            interfaces = [
+                get_node_text(type_node, source_code)
+                for interface_node in child.children
+                if interface_node.type == 'type_list'
+                for type_node in interface_node.children
+                if type_node.type == 'type_identifier' # Or other type nodes
+            ]
+            parts['implements'] = "implements " + ', '.join(interfaces)
+        elif child_type == 'formal_parameters':
+            parts['parameters'] = ', '.join(
+                get_node_text(param_child, source_code)
+                for param_child in child.children
+                if param_child.type == 'formal_parameter'
+            )
+        elif child_type == 'throws':
+            exceptions = [
+                get_node_text(exception_node, source_code)
+                for exception_node in child.children
+                if exception_node.type == 'type_identifier'
+            ]
+            parts['throws'] = "throws " + ', '.join(exceptions)
+    return parts
 
 def parse_java_file(file_path):
     """
     Parses a single Java file and extracts its structural index.
     Returns a list of strings, each representing a structural element.
+
+    Results are cached on disk keyed by (path, mtime, size,
+    PARSER_VERSION), so re-indexing an unchanged file is a stat plus a
+    pickle load instead of a full tree-sitter parse.
     """
+    cache_file = None
+    mem_key = None
+    try:
+        st = os.stat(file_path)
+        mem_key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+        cached = _entry_cache.get(mem_key)
+        if cached is not None:
+            _entry_cache.move_to_end(mem_key)
+            return cached
+        cache_file = _cache_path(file_path, st)
+        with open(cache_file, 'rb') as f:
+            entry = pickle.load(f)
+        _remember(mem_key, entry)
+        return entry
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug("Ignoring unreadable cache entry for %s: %s", file_path, e)
+
     #index_entries = []
     entry = {
         'package': '',
@@ -94,31 +191,23 @@ def parse_java_file(file_path):
     }
     try:
         with open(file_path, 'rb') as f:
-            source_code_bytes = f.read()
+            source_bytes = f.read()
 
-        tree = parser.parse(source_code_bytes)
+        tree = parser.parse(source_bytes)
+        source_code = _source_text(source_bytes)
 
         # Add FILE entry first for this file
         #index_entries.append(f"FILE: {os.path.basename(file_path)}")
 
         current_package = "default" # Default package if no declaration found
-        q = JAVA_LANGUAGE.query("""
-        (
-            (package_declaration (scoped_identifier) @package_name)
-            (import_declaration (scoped_identifier) @import_name)?
-            (class_declaration)? @clazz
-            (record_declaration)? @rec
-            (interface_declaration)? @itf
-            (enum_declaration)? @enum
-        )
-        """)
+        q = _TOP_LEVEL_QUERY
         captures = q.captures(tree.root_node)
 
         if "package_name" in captures:
             pkg = captures["package_name"]
             if q :
                 package_name_node = pkg[0]
-                current_package = get_node_text(package_name_node, source_code_bytes)
+                current_package = get_node_text(package_name_node, source_code)
 
             #index_entries.append(f"PACKAGE: {current_package}")
             entry['package'] = current_package
@@ -131,7 +220,7 @@ def parse_java_file(file_path):
             if q :
                 for i in imp:
                     import_name_node = i
-                    current_imp = get_node_text(import_name_node, source_code_bytes)
+                    current_imp = get_node_text(import_name_node, source_code)
                     #index_entries.append(f"IMPORT: {current_imp}")
                     imports.append(current_imp)
 
@@ -144,11 +233,15 @@ def parse_java_file(file_path):
             if t in captures and len(captures[t]):
                 for child in captures[t]:
                     node_type = child.type.replace('_declaration', '')
-                    modifiers = extract_modifiers(child, source_code_bytes)
-                    name = get_node_text(child.child_by_field_name('name'), source_code_bytes)
-                    type_parameters = extract_type_parameters(child, source_code_bytes)
-                    extends_clause, implements_clause = extract_extends_implements(child, source_code_bytes)
-                    class_signature = f"{modifiers} {node_type} {name}{type_parameters} {extends_clause} {implements_clause}".strip().replace('  ', ' ')
+                    parts = extract_decl_parts(child, source_code)
+                    modifiers = parts['modifiers']
+                    name = get_node_text(child.child_by_field_name('name'), source_code)
+                    # join only the parts that exist: one O(n) pass, no
+                    # strip/replace rescans that missed triple spaces anyway
+                    class_signature = ' '.join(filter(None, [
+                        modifiers, node_type, name + parts['type_parameters'],
+                        parts['extends'], parts['implements'],
+                    ]))
 
                     #index_entries.append(f"  {node_type.upper()}: {class_signature}")
                     entry['entity'] = class_signature
@@ -161,69 +254,110 @@ def parse_java_file(file_path):
                     fields = []
                     constructors = []
                     if body_node:
-                        for member_node in body_node.children:
-                            if member_node.type == 'method_declaration':
-                                method_modifiers = extract_modifiers(member_node, source_code_bytes)
-                                return_type_node = member_node.child_by_field_name('type')
-                                return_type = get_node_text(return_type_node, source_code_bytes) if return_type_node else ""
-                                method_name_node = member_node.child_by_field_name('name')
-                                method_name = get_node_text(method_name_node, source_code_bytes) if method_name_node else ""
-                                method_params = extract_method_parameters(member_node, source_code_bytes)
-                                throws_clause = extract_throws_clause(member_node, source_code_bytes)
-                                method_type_parameters = extract_type_parameters(member_node, source_code_bytes)
-
-                                method_signature = f"{method_modifiers} {method_type_parameters} {return_type} {method_name}({method_params}) {throws_clause}".strip().replace('  ', ' ')
-                                #index_entries.append(f"    METHOD: {method_signature}")
-                                methods.append(method_signature)
-
-                            elif member_node.type == 'field_declaration':
-                                field_modifiers = extract_modifiers(member_node, source_code_bytes)
-                                field_type_node = member_node.child_by_field_name('type')
-                                field_type = get_node_text(field_type_node, source_code_bytes) if field_type_node else ""
-                                # A field_declaration can have multiple variable_declarators
-                                for declarator in member_node.children:
-                                    if declarator.type == 'variable_declarator':
-                                        field_name_node = declarator.child_by_field_name('name')
-                                        field_name = get_node_text(field_name_node, source_code_bytes) if field_name_node else ""
-                                        field_signature = f"{field_modifiers} {field_type} {field_name}".strip().replace('  ', ' ')
-                                        #index_entries.append(f"    FIELD: {field_signature}")
-                                        fields.append(field_signature)
-
-                            elif member_node.type == 'constructor_declaration':
-                                constructor_modifiers = extract_modifiers(member_node, source_code_bytes)
-                                constructor_name_node = member_node.child_by_field_name('name')
-                                constructor_name = get_node_text(constructor_name_node, source_code_bytes) if constructor_name_node else ""
-                                constructor_params = extract_method_parameters(member_node, source_code_bytes)
-                                throws_clause = extract_throws_clause(member_node, source_code_bytes)
-
-                                constructor_signature = f"{constructor_modifiers} {constructor_name}({constructor_params}) {throws_clause}".strip().replace('  ', ' ')
-                                #index_entries.append(f"    CONSTRUCTOR: {constructor_signature}")
-                                constructors.append(constructor_signature)
+                        members = _MEMBERS_QUERY.captures(body_node)
+
+                        for member_node in members.get('m', []):
+                            if member_node.parent != body_node:
+                                continue
+                            member_parts = extract_decl_parts(member_node, source_code)
+                            return_type_node = member_node.child_by_field_name('type')
+                            return_type = get_node_text(return_type_node, source_code) if return_type_node else ""
+                            method_name_node = member_node.child_by_field_name('name')
+                            method_name = get_node_text(method_name_node, source_code) if method_name_node else ""
+
+                            method_signature = ' '.join(filter(None, [
+                                member_parts['modifiers'], member_parts['type_parameters'],
+                                return_type, f"{method_name}({member_parts['parameters']})",
+                                member_parts['throws'],
+                            ]))
+                            #index_entries.append(f"    METHOD: {method_signature}")
+                            methods.append(method_signature)
+
+                        for member_node in members.get('f', []):
+                            if member_node.parent != body_node:
+                                continue
+                            field_modifiers = extract_decl_parts(member_node, source_code)['modifiers']
+                            field_type_node = member_node.child_by_field_name('type')
+                            field_type = get_node_text(field_type_node, source_code) if field_type_node else ""
+                            # A field_declaration can have multiple variable_declarators
+                            for declarator in member_node.children:
+                                if declarator.type == 'variable_declarator':
+                                    field_name_node = declarator.child_by_field_name('name')
+                                    field_name = get_node_text(field_name_node, source_code) if field_name_node else ""
+                                    field_signature = ' '.join(filter(None, [field_modifiers, field_type, field_name]))
+                                    #index_entries.append(f"    FIELD: {field_signature}")
+                                    fields.append(field_signature)
+
+                        for member_node in members.get('c', []):
+                            if member_node.parent != body_node:
+                                continue
+                            member_parts = extract_decl_parts(member_node, source_code)
+                            constructor_name_node = member_node.child_by_field_name('name')
+                            constructor_name = get_node_text(constructor_name_node, source_code) if constructor_name_node else ""
+
+                            constructor_signature = ' '.join(filter(None, [
+                                member_parts['modifiers'],
+                                f"{constructor_name}({member_parts['parameters']})",
+                                member_parts['throws'],
+                            ]))
+                            #index_entries.append(f"    CONSTRUCTOR: {constructor_signature}")
+                            constructors.append(constructor_signature)
                     entry['constructors'] = constructors
                     entry['fields'] = fields
                     entry['methods'] = methods
 
+        _remember(mem_key, entry)
+        if cache_file:
+            try:
+                os.makedirs(AST_CACHE_DIR, exist_ok=True)
+                with open(cache_file, 'wb') as f:
+                    pickle.dump(entry, f, protocol=5)
+            except OSError as e:
+                logger.debug("Could not write cache entry for %s: %s", file_path, e)
+
     except FileNotFoundError:
-        logger.error(f"Error: File not found at {file_path}")
+        logger.error("Error: File not found at %s", file_path)
 
     except Exception as e:
-        logger.error(f"Error parsing {file_path}: {e}")
+        logger.error("Error parsing %s: %s", file_path, e)
 
     return entry
 
-def create_project_index(project_root_dir):
+def create_project_index(project_root_dir, max_workers=None):
     """
     Traverses a project directory, parses all Java files, and
-    generates a comprehensive structural index.
+    generates a comprehensive structural index, yielding one entry per
+    file in path order.
+
+    Files are parsed by a process pool: the extraction walk is CPU-bound
+    Python, so separate interpreters scale where threads would serialize
+    on the GIL. Each worker builds its own parser when it imports this
+    module. Entries are yielded as results arrive instead of collected
+    into a list, so consumers that write them out keep memory at
+    O(entry) even for repositories with tens of thousands of files.
     """
-    full_project_index = []
-    for root, _, files in tqdm(os.walk(project_root_dir), desc="Parsing files", unit="file"):
-        for file in files:
-            if file.endswith(".java"):# and "Options" in file:
-                file_path = os.path.join(root, file)
-                file_index = parse_java_file(file_path)
-                full_project_index.append(file_index)
-    return full_project_index
+    # Imported lazily: worker processes re-import this module and have
+    # no use for the git tooling (and its pydantic model imports).
+    from gitreviewer.tools.git import ls_files
+
+    # Respect the project's .gitignore when there is one, so generated
+    # and vendored Java files are never parsed.
+    java_files = ls_files(project_root_dir, suffix=".java")
+    if java_files is None:
+        java_files = []
+        for root, _, files in os.walk(project_root_dir):
+            for file in files:
+                if file.endswith(".java"):# and "Options" in file:
+                    java_files.append(os.path.join(root, file))
+
+    if not java_files:
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        yield from tqdm(
+            pool.map(parse_java_file, java_files, chunksize=16),
+            total=len(java_files), desc="Parsing files", unit="file",
+        )
 
 if __name__ == "__main__":
     #project_path = input("Enter the path to your Java project root directory: ")
@@ -233,14 +367,18 @@ if __name__ == "__main__":
         print(f"Error: '{project_path}' is not a valid directory.")
     else:
         print(f"\nGenerating index for project: {project_path}\n")
-        project_index = create_project_index(project_path)
-
-        for entry in project_index:
-            print(json.dumps(entry))
 
+        # One compact JSON line per file, written as each entry is
+        # parsed: no whole-index list in memory and no second
+        # serialization pass for a stdout dump.
         output_file = "java_codebase_index.txt"
-        with open(output_file, "w") as f:
-            f.write(json.dumps(project_index))
-
-        print("You can now feed the content of 'java_codebase_index.txt' to your LLM.")
+        indexed = 0
+        with open(output_file, "w", buffering=1 << 20) as f:
+            for entry in create_project_index(project_path):
+                f.write(json.dumps(entry, separators=(',', ':')))
+                f.write('\n')
+                indexed += 1
+
+        print(f"Indexed {indexed} files into '{output_file}'.")
+        print(f"You can now feed the content of '{output_file}' to your LLM.")
 
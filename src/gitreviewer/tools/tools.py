@@ -0,0 +1,450 @@
+"""Plain-function tools for LLM tool calling.
+
+An earlier sketch kept these behind GitTool/FileTool classes in a
+module the tools package shadowed; the instances carried no state, so
+the tools are plain functions the REPL can register directly.
+"""
+import copy
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from gitreviewer.cache import CACHE_DIR, SqliteCache
+from gitreviewer.util import logger
+
+# Directory names never worth descending into when walking a tree.
+_SKIP_DIRS = {".git", "__pycache__", "node_modules", ".venv"}
+
+
+@lru_cache(maxsize=64)
+def _canon(project_dir):
+    """Canonical form of a project path, resolved once per session.
+
+    realpath lstat-walks every path component; a review session passes
+    the same directory dozens of times, so the symlink resolution is
+    paid once. Canonical keys also stop the diff and listing caches
+    from splitting entries between ./repo and its resolved form.
+    """
+    return os.path.realpath(project_dir)
+
+
+# project_dir -> ((HEAD sha, .git/index mtime), paths): repeated
+# listings of an unchanged repository cost a stat and a dict hit.
+_ls_cache = {}
+
+
+def list_files(project_dir, *, suffixes=None):
+    """Iterates the paths of every file under project_dir.
+
+    suffixes restricts the listing to extensions (without the dot, e.g.
+    frozenset({"py", "md"})) during the walk itself, so consumers are
+    not handed thousands of paths just to re-check the extension of
+    each one. rpartition does the split in one C call.
+
+    For a git-managed project the listing comes from
+    `git ls-files -co --exclude-standard`: one subprocess call that
+    returns tracked plus untracked-but-not-ignored files, letting git's
+    index do the work instead of scanning every dentry — node_modules/,
+    build output and .git/ are never even opened. The result is cached
+    on (HEAD sha, .git/index mtime).
+
+    Outside a repository, falls back to a lazy os.scandir walk: the
+    DirEntry type checks reuse the stat data the directory read already
+    returned, instead of issuing a stat per entry the way pathlib's
+    rglob does. Callers that stop early never pay for the rest of the
+    tree; wrap in list() only at an API boundary.
+    """
+    project_dir = _canon(project_dir)
+    sha = _head_sha(project_dir)
+    if sha is not None:
+        try:
+            index_mtime = os.path.getmtime(os.path.join(project_dir, ".git", "index"))
+        except OSError:
+            index_mtime = None
+        cached = _ls_cache.get(project_dir)
+        if cached and cached[0] == (sha, index_mtime):
+            paths = cached[1]
+        else:
+            paths = None
+            out = _run_git(project_dir, "ls-files", "-co", "--exclude-standard")
+            if out is not None:
+                paths = [os.path.join(project_dir, line) for line in out.splitlines()]
+                _ls_cache[project_dir] = ((sha, index_mtime), paths)
+                logger.info("Listed %d files under %s", len(paths), project_dir)
+        if paths is not None:
+            if suffixes is None:
+                return paths
+            return [p for p in paths if p.rpartition('.')[2] in suffixes]
+
+    # The walk itself never logs per entry — on a 10k-file tree that
+    # would be 10k logger.handle calls and lock round-trips. One
+    # aggregate line with the count goes out when the walk completes.
+    def scan(d):
+        with os.scandir(d) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    if e.name in _SKIP_DIRS:
+                        continue
+                    yield from scan(e.path)
+                elif e.is_file(follow_symlinks=False):
+                    if suffixes is None or e.name.rpartition('.')[2] in suffixes:
+                        yield e.path
+
+    def walk():
+        n = 0
+        for path in scan(project_dir):
+            n += 1
+            yield path
+        logger.info("Listed %d files under %s", n, project_dir)
+
+    return walk()
+
+
+# (path, mtime_ns, size) -> contents. Bounded by total bytes rather
+# than entry count, since source files vary wildly in size. read_files
+# drives read_file from many threads, so every lookup/insert/evict on
+# the cache happens under the lock — the size accounting is a
+# read-modify-write that interleaving would drift.
+_READ_CACHE_BYTES = 64 << 20
+_read_cache = OrderedDict()
+_read_cache_size = 0
+_read_lock = threading.Lock()
+
+
+def read_file(file_path):
+    """Returns the decoded contents of file_path.
+
+    The LLM tool loop tends to re-inspect the same files several times
+    within one session; results are memoized on (path, mtime_ns, size),
+    so an unchanged file hits the disk once and an edited file gets a
+    fresh key. The cache holds at most 64 MiB of text and evicts the
+    least recently used entries past that.
+    """
+    global _read_cache_size
+    try:
+        st = os.stat(file_path)
+    except OSError as e:
+        logger.error("Could not stat '%s': %s", file_path, e)
+        return ""
+    key = (file_path, st.st_mtime_ns, st.st_size)
+    with _read_lock:
+        cached = _read_cache.get(key)
+        if cached is not None:
+            _read_cache.move_to_end(key)
+            return cached
+
+    # One open/read/close per file: the buffered io stack pays extra
+    # fstat/lseek/ioctl round-trips, and the size is already known from
+    # the stat taken for the cache key.
+    try:
+        fd = os.open(file_path, os.O_RDONLY | os.O_CLOEXEC)
+    except OSError as e:
+        logger.error("Could not read '%s': %s", file_path, e)
+        return ""
+    try:
+        raw = os.read(fd, st.st_size) if st.st_size else b""
+        if len(raw) < st.st_size:
+            # short read (file changed underneath us): drain the rest
+            chunks = [raw]
+            while (chunk := os.read(fd, 1 << 16)):
+                chunks.append(chunk)
+            raw = b"".join(chunks)
+    finally:
+        os.close(fd)
+    data = raw.decode("utf-8", errors="replace")
+    with _read_lock:
+        # two threads can race the same missed key; only account it once
+        if key not in _read_cache:
+            _read_cache[key] = data
+            _read_cache_size += len(data)
+            while _read_cache_size > _READ_CACHE_BYTES:
+                _, evicted = _read_cache.popitem(last=False)
+                _read_cache_size -= len(evicted)
+    return data
+
+
+def read_files(paths):
+    """Reads many files concurrently; returns {path: contents}.
+
+    Reading the changed files one by one leaves the process blocked on
+    each read's latency in turn. os.read releases the GIL, so a thread
+    pool overlaps the waits and throughput scales with the disk's queue
+    depth — the win is largest on networked filesystems. Cache hits in
+    read_file still short-circuit per file.
+    """
+    paths = list(paths)
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(32, len(paths))) as pool:
+        return dict(zip(paths, pool.map(read_file, paths)))
+
+
+def _head_sha(project_dir):
+    """Returns the current HEAD commit sha, or None outside a repository."""
+    result = subprocess.run(
+        ["git", "-C", project_dir, "rev-parse", "HEAD"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+# (project_dir, HEAD sha) -> diff text. A review session calls diff()
+# repeatedly against the same commit, so only the first call pays the
+# subprocess fork+exec.
+_diff_cache = {}
+
+
+@lru_cache(maxsize=1)
+def _disk_cache():
+    """Persistent store for diff results, shared across CLI runs.
+
+    A CLI tool starts one process per invocation, so an in-memory memo
+    alone gives nothing across runs; the SQLite backend makes a
+    repeated review of the same state near-instant. Built lazily so
+    importing the module never touches the cache directory.
+    """
+    return SqliteCache(path=os.path.join(CACHE_DIR, "tools.sqlite"))
+
+# Diffs past these limits would not fit an LLM context anyway; callers
+# get the per-file stat summary instead of megabytes of hunks that
+# first have to sit in memory.
+MAX_DIFF_FILES = 50
+MAX_DIFF_BYTES = 1 << 20
+_AVG_LINE_BYTES = 80
+
+
+def _parse_shortstat(text):
+    """Parses 'N files changed, X insertions(+), Y deletions(-)'.
+
+    Returns (files, changed_lines); missing pieces count as zero.
+    """
+    files = changed = 0
+    for part in text.strip().split(', '):
+        head = part.split(' ', 1)[0]
+        if not head.isdigit():
+            continue
+        if 'file' in part:
+            files = int(head)
+        else:
+            changed += int(head)
+    return files, changed
+
+
+def _run_git(project_dir, *args):
+    """Runs a git subcommand, returning its stdout or None on failure."""
+    result = subprocess.run(
+        ["git", "-C", project_dir, *args],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        logger.error("git %s failed for '%s': %s", args[0], project_dir, result.stderr.strip())
+        return None
+    return result.stdout
+
+
+def diff(project_dir):
+    """Returns the diff of the working tree for the project.
+
+    Memoized on (project_dir, HEAD sha). The sha does not change when
+    the working tree is edited, so callers that modify files must drop
+    the stale entry with invalidate_diff_cache.
+
+    A cheap --shortstat probe runs first: when the change is too big to
+    review in full (many files or an estimated megabyte of hunks), the
+    per-file --stat summary is returned instead of the unified diff.
+    """
+    project_dir = _canon(project_dir)
+    sha = _head_sha(project_dir)
+    key = (project_dir, sha)
+    if sha is not None:
+        cached = _diff_cache.get(key)
+        if cached is not None:
+            return cached
+
+    shortstat = _run_git(project_dir, "diff", "--shortstat")
+    if shortstat is None:
+        return ""
+
+    # The disk key mixes the shortstat in with the sha: HEAD does not
+    # move when the working tree is edited between runs, but the stat
+    # line does, so a stale cross-run entry misses instead of being
+    # served.
+    disk_key = None
+    if sha is not None:
+        disk_key = hashlib.blake2b(
+            f"diff:{project_dir}:{sha}:{shortstat}".encode()
+        ).hexdigest()
+        stored = _disk_cache().get(disk_key)
+        if stored is not None:
+            _diff_cache[key] = stored
+            return stored
+
+    files, changed = _parse_shortstat(shortstat)
+    if files > MAX_DIFF_FILES or changed * _AVG_LINE_BYTES > MAX_DIFF_BYTES:
+        logger.info("Diff too large (%d files, %d lines); returning stat summary", files, changed)
+        out = _run_git(project_dir, "diff", "--stat") or shortstat
+    else:
+        out = _run_git(project_dir, "diff")
+        if out is None:
+            return ""
+    if sha is not None:
+        _diff_cache[key] = out
+        _disk_cache().set(disk_key, out)
+    return out
+
+
+def diff_iter(project_dir):
+    """Streams the working-tree diff one file section at a time.
+
+    Lines are read straight off the git pipe and grouped by their
+    'diff --git' header, so peak memory stays at one file's hunks
+    instead of the whole diff. Callers that really need the full text
+    can ''.join(diff_iter(...)); consumers that forward sections to the
+    LLM (or bail out early) never materialize it.
+    """
+    project_dir = _canon(project_dir)
+    proc = subprocess.Popen(
+        ["git", "-C", project_dir, "diff"],
+        stdout=subprocess.PIPE, bufsize=1 << 20, text=True,
+    )
+    section = []
+    try:
+        for line in proc.stdout:
+            if line.startswith("diff --git ") and section:
+                yield "".join(section)
+                section = []
+            section.append(line)
+        if section:
+            yield "".join(section)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+
+def invalidate_diff_cache(project_dir=None):
+    """Drops cached diffs for one project, or for all of them."""
+    if project_dir is None:
+        _diff_cache.clear()
+        return
+    project_dir = _canon(project_dir)
+    for key in [k for k in _diff_cache if k[0] == project_dir]:
+        del _diff_cache[key]
+
+
+# Tool schemas handed to the LLM, built once at import time: the REPL
+# registers the tools on every turn, and rebuilding thirty identical
+# nested dicts per call buys nothing. The tuple is shared — treat it
+# as immutable.
+_FN_DEFS = (
+    {
+        "type": "function",
+        "function": {
+            "name": "diff",
+            "description": "Get the diff of the working tree of a git project. "
+                           "Very large changes come back as a per-file stat summary.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "project_dir": {
+                        "type": "string",
+                        "description": "Path to the project directory.",
+                    },
+                },
+                "required": ["project_dir"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "list_files",
+            "description": "List the files of a project, honoring its .gitignore.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "project_dir": {
+                        "type": "string",
+                        "description": "Path to the project directory.",
+                    },
+                },
+                "required": ["project_dir"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "read_file",
+            "description": "Read the contents of one source file.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "file_path": {
+                        "type": "string",
+                        "description": "Path of the file to read.",
+                    },
+                },
+                "required": ["file_path"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "read_files",
+            "description": "Read several source files at once; returns a mapping of path to contents.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "paths": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Paths of the files to read.",
+                    },
+                },
+                "required": ["paths"],
+            },
+        },
+    },
+)
+
+
+# The wire form of the schemas never changes either, so it is encoded
+# once here instead of running json.dumps on every LLM request.
+_FN_DEFS_JSON = json.dumps(_FN_DEFS, separators=(",", ":")).encode()
+
+# name -> schema, so dispatching a tool call is one dict lookup instead
+# of a scan of the definitions list per call.
+_FN_DEFS_BY_NAME = {d["function"]["name"]: d for d in _FN_DEFS}
+
+
+def fn_definition(name):
+    """Returns the schema of one tool by name, or None if unknown."""
+    return _FN_DEFS_BY_NAME.get(name)
+
+
+def fn_definitions_json():
+    """Returns the tool schemas pre-serialized as compact JSON bytes.
+
+    Callers building raw HTTP payloads can splice the buffer in
+    directly instead of re-encoding the schemas per request.
+    """
+    return _FN_DEFS_JSON
+
+
+def fn_definitions(copy_defs=False):
+    """Returns the schemas of the tools in this module.
+
+    The same tuple is returned on every call; pass copy_defs=True for a
+    deep copy when the schemas are going to be mutated.
+    """
+    if copy_defs:
+        return copy.deepcopy(_FN_DEFS)
+    return _FN_DEFS
@@ -2,10 +2,19 @@ import os
 import logging
 from dotenv import load_dotenv
 
-load_dotenv()
+# load_dotenv walks the filesystem looking for a .env file; once per
+# process is enough, and the guard keeps re-imports (subprocess
+# workers, pytest) from repeating the scan.
+if not os.environ.get("_GITREVIEWER_ENV_LOADED"):
+    load_dotenv()
+    os.environ["_GITREVIEWER_ENV_LOADED"] = "1"
 
-logging.basicConfig(level=logging.INFO)
+# Library code must not install root handlers: the embedding
+# application owns logging configuration, and the CLI entrypoint calls
+# basicConfig exactly once. The NullHandler only suppresses the
+# "no handlers found" warning when nobody configures anything.
 logging.getLogger("httpx").setLevel(logging.ERROR)
 logger = logging.getLogger("gitreviewer")
+logger.addHandler(logging.NullHandler())
 
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gemini-2.5-flash-preview-05-20")